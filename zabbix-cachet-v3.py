@@ -4,20 +4,32 @@ This script populated Cachet of Zabbix IT Services
 """
 import sys
 import os
+import concurrent.futures
 import datetime
+import functools
+import hashlib
 import json
+import queue
 import requests
 import time
 import threading
 import logging
 import yaml
 import pytz
-import traceback
 from pyzabbix import ZabbixAPI, ZabbixAPIException
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from operator import itemgetter
 from enum import Enum
+from dataclasses import dataclass
+from typing import Optional
 import urllib3
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 __author__ = "Artem Alexandrov <qk4l()tem4uk.ru>"
 __license__ = """The MIT License (MIT)"""
@@ -25,6 +37,18 @@ __version__ = "1.3.7"
 
 os.environ["REQUESTS_CA_BUNDLE"] = "/etc/ssl/certs/ca-certificates.crt"
 
+# Number of syncs without changes before update_comp_interval starts to grow
+UNCHANGED_CYCLES_BEFORE_BACKOFF = 3
+
+# Format of time in incident messages
+TIME_FORMAT = "%b %d, %H:%M"
+
+# Headers for requests with body already serialized by json_dumps()
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Retry of connection errors and transient HTTP statuses for Zabbix and Cachet
+HTTP_RETRY = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504])
+
 
 class CachetComponentStatus(Enum):
     OPERATIONAL = 1
@@ -54,58 +78,182 @@ class CachetIncidentStatus(Enum):
     FIXED = 4
 
 
+@dataclass(slots=True)
+class ServiceEntry:
+    """
+    Mapping between Zabbix IT service and Cachet component
+    """
+
+    component_id: int
+    component_name: str
+    triggerid: Optional[str] = None
+    serviceid: Optional[str] = None
+    group_id: Optional[int] = None
+    group_name: str = ""
+
+
+# Plain values of statuses used in hot loop of triggers_watcher
+COMPONENT_OPERATIONAL = CachetComponentStatus.OPERATIONAL.value
+INCIDENT_INVESTIGATING = CachetIncidentStatus.INVESTIGATING.value
+INCIDENT_IDENTIFIED = CachetIncidentStatus.IDENTIFIED.value
+INCIDENT_FIXED = CachetIncidentStatus.FIXED.value
+
+# Cachet component status indexed by Zabbix trigger priority
+PRIORITY_TO_COMPONENT_STATUS = (
+    CachetComponentStatus.PERFORMANCE_ISSUES.value,  # NOT_CLASSIFIED
+    CachetComponentStatus.PERFORMANCE_ISSUES.value,  # INFORMATION
+    CachetComponentStatus.PERFORMANCE_ISSUES.value,  # WARNING
+    CachetComponentStatus.PARTIAL_OUTAGE.value,  # AVERAGE
+    CachetComponentStatus.MAJOR_OUTAGE.value,  # HIGH
+    CachetComponentStatus.MAJOR_OUTAGE.value,  # DISASTER
+)
+
+# Cachet component status indexed by Zabbix service status + 1
+ZABBIX_TO_CACHET_STATUS = (
+    CachetComponentStatus.OPERATIONAL.value,  # OK
+    CachetComponentStatus.UNKNOWN.value,  # NOT_CLASSIFIED
+    CachetComponentStatus.OPERATIONAL.value,  # INFORMATION
+    CachetComponentStatus.PERFORMANCE_ISSUES.value,  # WARNING
+    CachetComponentStatus.PARTIAL_OUTAGE.value,  # AVERAGE
+    CachetComponentStatus.MAJOR_OUTAGE.value,  # HIGH
+    CachetComponentStatus.MAJOR_OUTAGE.value,  # DISASTER
+)
+
+
 def map_zabbix_status_to_cachet_status(zabbix_status):
-    mapping = {
-        ZabbixServiceStatus.OK: CachetComponentStatus.OPERATIONAL,
-        ZabbixServiceStatus.NOT_CLASSIFIED: CachetComponentStatus.UNKNOWN,
-        ZabbixServiceStatus.INFORMATION: CachetComponentStatus.OPERATIONAL,
-        ZabbixServiceStatus.WARNING: CachetComponentStatus.PERFORMANCE_ISSUES,
-        ZabbixServiceStatus.AVERAGE: CachetComponentStatus.PARTIAL_OUTAGE,
-        ZabbixServiceStatus.HIGH: CachetComponentStatus.MAJOR_OUTAGE,
-        ZabbixServiceStatus.DISASTER: CachetComponentStatus.MAJOR_OUTAGE,
-    }
-    return mapping.get(zabbix_status, CachetComponentStatus.UNKNOWN).value
+    try:
+        idx = int(zabbix_status) - ZabbixServiceStatus.OK.value
+    except (TypeError, ValueError):
+        return CachetComponentStatus.UNKNOWN.value
+    if 0 <= idx < len(ZABBIX_TO_CACHET_STATUS):
+        return ZABBIX_TO_CACHET_STATUS[idx]
+    return CachetComponentStatus.UNKNOWN.value
 
 
 def client_http_error(url, code, message):
-    logging.error("ClientHttpError[%s, %s: %s]" % (url, code, message))
+    logging.error("ClientHttpError[%s, %s: %s]", url, code, message)
 
 
 def cachetapiexception(message):
     logging.error(message)
 
 
+@functools.lru_cache(maxsize=256)
+def format_clock(clock):
+    """
+    Format Zabbix unix timestamp for incident messages in configured time zone
+    Acknowledges often share the same second, so results are cached
+    :param clock: int
+    :return: str
+    """
+    return datetime.datetime.fromtimestamp(clock, tz=tz).strftime(TIME_FORMAT)
+
+
+def json_loads(data):
+    """
+    Parse json, use orjson if it is installed
+    :param data: bytes or str
+    :return: dict or list
+    """
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(data):
+    """
+    Serialize data to compact json, use orjson if it is installed
+    :param data: dict or list
+    :return: bytes or str
+    """
+    if orjson:
+        return orjson.dumps(data)
+    return json.dumps(data)
+
+
+def json_pretty(data):
+    """
+    Serialize data to indented json for debug logging
+    :param data: dict or list
+    :return: str
+    """
+    if orjson:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2, default=str).decode()
+    return json.dumps(data, indent=4, separators=(",", ": "))
+
+
+def fingerprint(data):
+    """
+    Short stable digest of json-like data to detect changes between runs
+    :param data: dict or list
+    :return: bytes
+    """
+    return hashlib.blake2b(
+        json.dumps(data, sort_keys=True, default=str).encode(), digest_size=16
+    ).digest()
+
+
+def mount_http_adapter(session, pool_connections, pool_maxsize, max_retries=0):
+    """
+    Mount pooled keep-alive HTTPAdapter to session for http and https
+    :param session: requests.Session
+    :param pool_connections: number of per host pools to cache
+    :param pool_maxsize: max number of connections in pool
+    :param max_retries: int or urllib3 Retry
+    :return: None
+    """
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=max_retries,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+
 def pyzabbix_safe(fail_result=False):
     def wrap(func):
-        def wrapperd_f(*args, **kwargs):
+        @functools.wraps(func)
+        def wrapped_f(self, *args, **kwargs):
             try:
-                return func(*args, **kwargs)
+                result = func(self, *args, **kwargs)
             except (requests.ConnectionError, ZabbixAPIException) as e:
-                logging.error("Zabbix Error: {}".format(e))
+                logging.error("Zabbix Error: %s", e)
+                self._last_ok_ts = None
                 return fail_result
+            # Remember when Zabbix answered last time
+            self._last_ok_ts = time.monotonic()
+            return result
 
-        return wrapperd_f
+        return wrapped_f
 
     return wrap
 
 
 class Zabbix:
-    def __init__(self, server, user, password, verify=True):
+    def __init__(self, server, user, password, verify=True, max_workers=8):
         """
         Init zabbix class for further needs
         :param user: string
         :param password: string
+        :param max_workers: number of threads which call Zabbix API at once
         :return: pyzabbix object
         """
         self.server = server
         self.user = user
         self.password = password
-        # Enable HTTP auth
-        s = requests.Session()
-        s.auth = (user, password)
+        self._last_ok_ts = None
 
+        # pyzabbix keeps a persistent requests.Session, reuse it for all calls
         self.zapi = ZabbixAPI(server)
-        self.zapi.session.verify = verify
+        self.session = self.zapi.session
+        self.session.verify = verify
+        mount_http_adapter(
+            self.session,
+            pool_connections=2,
+            pool_maxsize=max_workers * 2,
+            max_retries=HTTP_RETRY,
+        )
         self.zapi.login(user, password)
         self.version = self.get_version()
 
@@ -118,35 +266,82 @@ class Zabbix:
         version = self.zapi.apiinfo.version()
         return version
 
-    @pyzabbix_safe({})
-    def get_trigger(self, triggerid):
+    def is_available(self, health_ttl=60, force=False):
         """
-        Get trigger information
-        @param triggerid: string
-        @return: dict of data
+        Check if Zabbix API is alive
+        Real request is made only if there was no successful one
+        during last health_ttl seconds
+        :param health_ttl: seconds
+        :param force: always make real request
+        :return: bool
         """
-        trigger = self.zapi.trigger.get(
-            expandComment="true", expandDescription="true", triggerids=triggerid
-        )
-        return trigger[0]
+        if (
+            not force
+            and self._last_ok_ts is not None
+            and time.monotonic() - self._last_ok_ts <= health_ttl
+        ):
+            return True
+        return bool(self.get_version())
+
+    def get_triggers_bulk(self, triggerids):
+        """
+        Get information of several triggers by one request
+        @param triggerids: list of strings
+        @return: dict of data {triggerid: trigger}
+        """
+        # Skip outside of pyzabbix_safe, no request is no sign of Zabbix health
+        if not triggerids:
+            return {}
+        return self._get_triggers_bulk(triggerids)
 
     @pyzabbix_safe({})
-    def get_event(self, triggerid):
+    def _get_triggers_bulk(self, triggerids):
+        triggers = self.zapi.trigger.get(
+            expandComment="true", expandDescription="true", triggerids=triggerids
+        )
+        return {t["triggerid"]: t for t in triggers}
+
+    def get_events_bulk(self, triggerids):
         """
-        Get event information based on triggerid
-        @param triggerid: string
-        @return: dict of data
+        Get last problem event for several triggers by one request
+        @param triggerids: list of strings
+        @return: dict of data {triggerid: event}
         """
-        zbx_event = self.zapi.event.get(
+        if not triggerids:
+            return {}
+        return self._get_events_bulk(triggerids)
+
+    @pyzabbix_safe({})
+    def _get_events_bulk(self, triggerids):
+        zbx_events = self.zapi.event.get(
             select_acknowledges="extend",
             expandDescription="true",
             object=0,
             value=1,
-            objectids=triggerid,
+            objectids=triggerids,
+            sortfield="eventid",
+            sortorder="DESC",
         )
-        if len(zbx_event) >= 1:
-            return zbx_event[-1]
-        return zbx_event
+        events = {}
+        for event in zbx_events:
+            # Events are sorted from newest, keep the first one per trigger
+            events.setdefault(event["objectid"], event)
+        return events
+
+    def _service_fields(self):
+        """
+        Fields of IT service that are really used
+        Services have triggerid only before Zabbix 6.0
+        :return: list
+        """
+        fields = ["serviceid", "name", "status", "sortorder", "algorithm"]
+        try:
+            major = int(str(self.version).split(".")[0])
+        except ValueError:
+            major = 0
+        if major < 6:
+            fields.append("triggerid")
+        return fields
 
     @pyzabbix_safe([])
     def get_itservices(self, root=None):
@@ -164,76 +359,81 @@ class Zabbix:
         :return: Tree of Zabbix IT Services
         :rtype: list
         """
+        # Get every service by one request and build the tree from it
+        all_services = self.zapi.service.get(
+            # selectDependencies='extend',
+            output=self._service_fields(),
+            selectChildren=["serviceid"],
+            # selectParents='extend',
+            selectProblemTags=["tag", "value"],
+        )
+        services_by_id = {i["serviceid"]: i for i in all_services}
         if root:
-            logging.debug(f"Obtained root service: 1")
-            root_service = self.zapi.service.get(
-                # selectDependencies='extend',
-                output="extend",
-                selectChildren="extend",
-                selectProblemTags="extend",
-                # selectParents='extend',
-                filter={"name": root},
-            )
-            logging.debug(f"Obtained root service: 2")
+            root_service = [i for i in all_services if i["name"] == root]
             try:
                 root_service = root_service[0]
-                logging.debug(f"Obtained root service: {root_service}")
+                logging.debug("Obtained root service: %s", root_service)
             except IndexError:
-                logging.error('Can not find "{}" service in Zabbix'.format(root))
+                logging.error('Can not find "%s" service in Zabbix', root)
                 sys.exit(1)
-            service_ids = []
-            for dependency in root_service["children"]:
-                service_ids.append(dependency["serviceid"])
-            services = self.zapi.service.get(
-                # selectDependencies='extend',
-                selectChildren="extend",
-                selectProblemTags="extend",
-                # selectParents='extend',
-                serviceids=service_ids,
-            )
+            services = [
+                services_by_id[dependency["serviceid"]]
+                for dependency in root_service["children"]
+                if dependency["serviceid"] in services_by_id
+            ]
         else:
-            services = self.zapi.service.get(
-                # selectDependencies='extend',
-                selectChildren="extend",
-                selectParents="extend",
-                selectProblemTags="extend",
-                output="extend",
-            )
+            services = all_services
         if not services:
-            logging.error('Can not find any child service for "{}"'.format(root))
+            logging.error('Can not find any child service for "%s"', root)
             return []
         # Create a tree of services
-        known_ids = []
-        # At first proceed services with dependencies as groups
-        service_tree = [i for i in services if i["children"]]
-        for idx, service in enumerate(service_tree):
-            child_services_ids = []
-            for dependency in service["children"]:
-                child_services_ids.append(dependency["serviceid"])
-            child_services = self.zapi.service.get(
-                # selectDependencies='extend',
-                selectChildren="extend",
-                # selectParents='extend',
-                selectProblemTags="extend",
-                serviceids=child_services_ids,
+        known_ids = set()
+        service_tree = []
+        singers_services = []
+        for service in services:
+            if not service["children"]:
+                singers_services.append(service)
+                continue
+            # Services with dependencies are groups
+            child_services_ids = [i["serviceid"] for i in service["children"]]
+            # Copy children as the same service can be in several groups
+            service_tree.append(
+                dict(
+                    service,
+                    children=[
+                        dict(services_by_id[i])
+                        for i in child_services_ids
+                        if i in services_by_id
+                    ],
+                )
             )
-            service_tree[idx]["children"] = child_services
             # Save ids to filter them later
-            known_ids = known_ids + child_services_ids
-            known_ids.append(service["serviceid"])
+            known_ids.update(child_services_ids)
+            known_ids.add(service["serviceid"])
         # At proceed services without dependencies as singers
-        singers_services = [i for i in services if i["serviceid"] not in known_ids]
-        if singers_services:
-            service_tree = service_tree + singers_services
+        service_tree += [i for i in singers_services if i["serviceid"] not in known_ids]
         return service_tree
 
 
 class Cachet:
-    def __init__(self, server, token, verify=True):
+    def __init__(
+        self,
+        server,
+        token,
+        verify=True,
+        cache_ttl=0,
+        max_workers=8,
+        max_writes=4,
+        timeout=30,
+    ):
         """
         Init Cachet class for further needs
         : param server: string
         :param token: string
+        :param cache_ttl: seconds to keep GET results in memory, 0 disables cache
+        :param max_workers: number of threads which call Cachet API at once
+        :param max_writes: max number of concurrent POST/PUT requests
+        :param timeout: seconds to wait for Cachet response
         :return: object
         """
         self.server = server + "/api/"
@@ -243,6 +443,34 @@ class Cachet:
             "Accept": "application/json; indent=4",
         }
         self.verify = verify
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        # {key: (expires_at, value)}
+        self._cache = {}
+        # Cap inflight writes to respect Cachet rate limits
+        self._write_slots = threading.BoundedSemaphore(max_writes)
+        # Updates postponed till flush_batched(), keyed by id
+        self._pending_components = {}
+        self._pending_incidents = {}
+        self._pending_lock = threading.Lock()
+        # Prefetched components {(name, group_id): component}
+        # and groups {name: group}, see load_index()
+        self._component_index = None
+        self._group_index = None
+        # (component_id, status) pairs sent to Cachet during current pass
+        self._told = set()
+        # Locks of check-and-create of components and groups, keyed by name
+        self._create_locks = {}
+        # Keep-alive session shared by all Cachet API calls
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.verify = self.verify
+        mount_http_adapter(
+            self.session,
+            pool_connections=2,
+            pool_maxsize=max_workers * 2,
+            max_retries=HTTP_RETRY,
+        )
         self.version = self.get_version()
 
     def _http_post(self, url, params):
@@ -254,13 +482,17 @@ class Cachet:
         """
         url = self.server + url
         payload = {"visible": True, "enabled": True, **params}
-        logging.debug(
-            "Sending to {url}: {payload}".format(
-                url=url, payload=json.dumps(payload, indent=4, separators=(",", ": "))
-            )
-        )
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Sending to %s: %s", url, json_pretty(payload))
         try:
-            response = requests.request("POST", url, json=payload, headers=self.headers)
+            with self._write_slots:
+                response = self.session.post(
+                    url,
+                    data=json_dumps(payload),
+                    headers=JSON_HEADERS,
+                    verify=self.verify,
+                    timeout=self.timeout,
+                )
         except requests.exceptions.RequestException as err:
             raise client_http_error(url, response.status_code, err)
 
@@ -268,12 +500,11 @@ class Cachet:
             return client_http_error(url, response.status_code, response.text)
 
         try:
-            r_json = json.loads(response.text)
+            r_json = json_loads(response.content)
         except ValueError:
-            raise cachetapiexception("Unable to parse json: %s" % r.text)
-        logging.debug(
-            "Response Body: %s", json.dumps(r_json, indent=4, separators=(",", ": "))
-        )
+            raise cachetapiexception("Unable to parse json: %s" % response.text)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Response Body: %s", json_pretty(r_json))
         return r_json
 
     def _http_get(self, url, params=None):
@@ -286,14 +517,11 @@ class Cachet:
         if params is None:
             params = {}
         url = self.server + url
-        logging.debug(
-            "Sending to {url}: {param}".format(
-                url=url, param=json.dumps(params, indent=4, separators=(",", ": "))
-            )
-        )
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Sending to %s: %s", url, json_pretty(params))
         try:
-            r = requests.get(
-                url=url, headers=self.headers, params=params, verify=self.verify
+            r = self.session.get(
+                url=url, params=params, verify=self.verify, timeout=self.timeout
             )
         except requests.exceptions.RequestException as e:
             raise client_http_error(url, None, e)
@@ -303,12 +531,11 @@ class Cachet:
             sys.exit(1)
             return client_http_error(url, r.status_code, json.loads(r.text)["errors"])
         try:
-            r_json = json.loads(r.text)
+            r_json = json_loads(r.content)
         except ValueError:
             raise cachetapiexception("Unable to parse json: %s" % r.text)
-        logging.debug(
-            "Response Body: %s", json.dumps(r_json, indent=4, separators=(",", ": "))
-        )
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Response Body: %s", json_pretty(r_json))
         return r_json
 
     def _http_put(self, url, params):
@@ -319,29 +546,84 @@ class Cachet:
         :return: json
         """
         url = self.server + url
-        logging.debug(
-            "Sending to {url}: {param}".format(
-                url=url, param=json.dumps(params, indent=4, separators=(",", ": "))
-            )
-        )
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Sending to %s: %s", url, json_pretty(params))
         try:
-            r = requests.put(
-                url=url, json=params, headers=self.headers, verify=self.verify
-            )
+            with self._write_slots:
+                r = self.session.put(
+                    url=url,
+                    data=json_dumps(params),
+                    headers=JSON_HEADERS,
+                    verify=self.verify,
+                    timeout=self.timeout,
+                )
         except requests.exceptions.RequestException as e:
             raise client_http_error(url, None, e)
         # r.raise_for_status()
         if r.status_code != 200:
             return client_http_error(url, r.status_code, r.text)
         try:
-            r_json = json.loads(r.text)
+            r_json = json_loads(r.content)
         except ValueError:
             raise cachetapiexception("Unable to parse json: %s" % r.text)
-        logging.debug(
-            "Response Body: %s", json.dumps(r_json, indent=4, separators=(",", ": "))
-        )
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Response Body: %s", json_pretty(r_json))
         return r_json
 
+    def _paginate(self, url, params=None, per_page=100):
+        """
+        Iterate over items of all pages of paginated API
+        Next page is requested only when previous one is exhausted
+        :param url: str
+        :param params: dict
+        :param per_page: int
+        :return: generator of dicts
+        """
+        params = dict(params or {}, per_page=per_page)
+        page = 1  # Start with the first page
+
+        while True:
+            params["page"] = page
+            response = self._http_get(url, params=params)
+
+            data = response.get("data", [])
+            meta = response.get("meta", {})
+            yield from data
+
+            if not data or meta.get("to") is None:
+                break  # Exit loop if no more pages
+            # Short page is the last one, do not ask for an empty one
+            if len(data) < int(meta.get("per_page", per_page)):
+                break
+
+            page += 1
+
+    def _cached_get(self, url, params_key, fetch):
+        """
+        Return cached result of fetch() if it is younger than cache_ttl
+        :param url: str
+        :param params_key: hashable part of cache key
+        :param fetch: callable that makes real request
+        :return: json data
+        """
+        key = (url, params_key)
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+        value = fetch()
+        if self.cache_ttl and value is not None:
+            self._cache[key] = (now + self.cache_ttl, value)
+        return value
+
+    def _invalidate(self, component_id):
+        """
+        Drop cached data related to component
+        :param component_id: str or int
+        """
+        self._cache.pop(("components/" + str(component_id), None), None)
+        self._cache.pop(("incidents", str(component_id)), None)
+
     def get_version(self):
         """
         Get Cachet version for logging
@@ -358,8 +640,7 @@ class Cachet:
         @return: dict
         """
         url = "components/" + str(id)
-        data = self._http_get(url)
-        return data
+        return self._cached_get(url, None, lambda: self._http_get(url))
 
     def get_components(self, name=None):
         """
@@ -372,10 +653,18 @@ class Cachet:
         """
         url = "components"
         if name:
-            return self.find_component_by_name(name, url)
+            return self._cached_get(
+                url, name, lambda: self.find_component_by_name(name, url)
+            )
 
-        data = self._http_get(url)
-        return data
+        return self._cached_get(url, None, lambda: self._http_get(url))
+
+    def get_components_all(self):
+        """
+        Get all registered components from every page
+        :return: list of components
+        """
+        return list(self._paginate("components", {"include": "group"}))
 
     def find_component_by_name(self, name, url):
         """
@@ -388,22 +677,11 @@ class Cachet:
         Returns:
             dict: The group data if found, otherwise a default "not found" response.
         """
-        page = 1  # Start with the first page
-
-        while True:
-            # Fetch the current page data
-            response = self._http_get(url, params={"page": page, "include": "group"})
-
-            data = response.get("data", [])
-            meta = response.get("meta", {})
-            for component in data:
-                if component.get("attributes").get("name") == name:
-                    return component  # Return the group if found
-
-            if not data or "current_page" not in meta:
-                break  # Exit loop if no more pages
-
-            page += 1
+        # Let Cachet filter by name, fall back to scan if filter is ignored
+        params = {"filter[name]": name, "include": "group"}
+        for component in self._paginate(url, params):
+            if component["attributes"]["name"] == name:
+                return component  # Return the group if found
 
         return {"id": 0, "name": "Does not exist"}
 
@@ -427,30 +705,107 @@ class Cachet:
             if str(params[i]).strip() == "":
                 params.pop(i)
 
-        component = self.get_components(name)
-        if isinstance(component, list):
-            for i in component:
-                if i["component_group_id"] == params["component_group_id"]:
-                    return i
-        elif isinstance(component, dict):
-            relationships = component.get("relationships")
-            group_id = 0
-            if relationships:
-                group = relationships.get("group")
-                if group:
-                    data = group.get("data")
-                    if data:
-                        group_id = data.get("id")
-            if not component["id"] == 0 and group_id == params["component_group_id"]:
-                return component
-
-        # Create component if it does not exist or exist in other group
-        url = "components"
-        logging.debug("Creating Cachet component {name}...".format(name=params["name"]))
-        params["componentGroupId"] = params["component_group_id"]
-        data = self._http_post(url, params)
+        index_key = (name, str(params["component_group_id"]))
+        # Threads of init_cachet must not create the same component twice
+        with self._creation_lock(("component",) + index_key):
+            existing = None
+            if self._component_index is not None:
+                existing = self._component_index.get(index_key)
+            else:
+                component = self.get_components(name)
+                if isinstance(component, list):
+                    for i in component:
+                        if i["component_group_id"] == params["component_group_id"]:
+                            existing = i
+                            break
+                elif isinstance(component, dict):
+                    group_id = self._component_group_id(component)
+                    if (
+                        not component["id"] == 0
+                        and group_id == params["component_group_id"]
+                    ):
+                        existing = component
+            if existing:
+                return self._sync_component_details(existing, params, index_key)
+
+            # Create component if it does not exist or exist in other group
+            url = "components"
+            logging.debug("Creating Cachet component %s...", params["name"])
+            params["componentGroupId"] = params["component_group_id"]
+            data = self._http_post(url, params)
+            self._cache.pop((url, name), None)
+            if self._component_index is not None:
+                self._component_index[index_key] = data["data"]
+            return data["data"]
+
+    def _sync_component_details(self, component, params, index_key):
+        """
+        Update link and description of existing component if they differ.
+        Status is left to triggers_watcher
+        @param component: dict
+        @param params: wanted values of component
+        @param index_key: key of component in components index
+        @return: dict of data
+        """
+        attributes = component.get("attributes", component)
+        changed = {
+            i: params[i]
+            for i in ("link", "description")
+            if i in params and params[i] != attributes.get(i)
+        }
+        if not changed:
+            return component
+        logging.debug(
+            "Updating Cachet component %s: %s", params["name"], ", ".join(changed)
+        )
+        data = self.upd_components(component["id"], **changed)
+        if not data:
+            return component
+        if self._component_index is not None:
+            self._component_index[index_key] = data["data"]
         return data["data"]
 
+    def _creation_lock(self, key):
+        """
+        Get lock which serializes lookup and creation of the same object
+        @param key: tuple
+        @return: threading.Lock
+        """
+        with self._pending_lock:
+            return self._create_locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _component_group_id(component):
+        """
+        Get id of group component belongs to
+        @param component: dict
+        @return: group id or 0 if component is not in a group
+        """
+        relationships = component.get("relationships")
+        group_id = 0
+        if relationships:
+            group = relationships.get("group")
+            if group:
+                data = group.get("data")
+                if data:
+                    group_id = data.get("id")
+        return group_id
+
+    def load_index(self):
+        """
+        Prefetch all components and component groups at once.
+        After that new_components() and new_components_gr() check
+        existence of objects without extra requests
+        @return: None
+        """
+        self._component_index = {
+            (c["attributes"]["name"], str(self._component_group_id(c))): c
+            for c in self.get_components_all()
+        }
+        self._group_index = {
+            g["attributes"]["name"]: g for g in self._paginate("component-groups")
+        }
+
     def upd_components(self, id, **kwargs):
         """
         Update component
@@ -459,16 +814,32 @@ class Cachet:
         @return: boolean
         """
         url = "components/" + str(id)
-        params = self.get_component(id)["data"]
+        status = kwargs.get("status")
+        if list(kwargs) == ["status"] and (str(id), str(status)) in self._told:
+            logging.debug(
+                "Component id=%s already got status %s in this pass", id, status
+            )
+            return None
+        component = self.get_component(id)["data"]
+        current_status = component["attributes"]["status"]["value"]
+        if list(kwargs) == ["status"] and str(current_status) == str(status):
+            logging.debug(
+                "Component id=%s already has status %s, skip update", id, status
+            )
+            return None
+        # Copy to keep cached component intact
+        params = dict(component)
         params.update(kwargs)
         data = self._http_put(url, params)
+        self._invalidate(id)
         if data:
+            if status is not None:
+                self._told.add((str(id), str(status)))
             logging.info(
-                "Component {name} (id={id}) was updated. Status - {status}".format(
-                    name=data["data"]["attributes"]["name"],
-                    id=id,
-                    status=data["data"]["attributes"]["status"]["human"],
-                )
+                "Component %s (id=%s) was updated. Status - %s",
+                data["data"]["attributes"]["name"],
+                id,
+                data["data"]["attributes"]["status"]["human"],
             )
         return data
 
@@ -480,10 +851,11 @@ class Cachet:
         @return: dict of data
         """
         url = "component-groups"
-        data = self._http_get(url)
         if name:
-            return self.find_group_by_name(name, url)
-        return data
+            return self._cached_get(
+                url, name, lambda: self.find_group_by_name(name, url)
+            )
+        return self._cached_get(url, None, lambda: self._http_get(url))
 
     def find_group_by_name(self, name, url):
         """
@@ -496,22 +868,9 @@ class Cachet:
         Returns:
             dict: The group data if found, otherwise a default "not found" response.
         """
-        page = 1  # Start with the first page
-
-        while True:
-            response = self._http_get(url, params={"page": page})
-
-            data = response.get("data", [])
-            meta = response.get("meta", {})
-
-            for group in data:
-                if group.get("attributes").get("name") == name:
-                    return group
-
-            if not data or "current_page" not in meta:
-                break  # Exit loop if no more pages
-
-            page += 1
+        for group in self._paginate(url, {"filter[name]": name}):
+            if group["attributes"]["name"] == name:
+                return group
 
         return {"id": 0, "name": "Does not exist"}
 
@@ -521,23 +880,31 @@ class Cachet:
         @param name: string
         @return: dict of data
         """
-        # Check if component's group already exists
-        components_gr_id = self.get_components_gr(name)
-        if components_gr_id["id"] == 0:
-            url = "component-groups"
-            params = {"name": name, "collapsed": 2}
-            logging.debug("Creating Component Group {}...".format(params["name"]))
-            data = self._http_post(url, params)
-            if data is not None and "data" in data:
-                logging.info(
-                    "Component Group {} was created ({})".format(
-                        params["name"], data["data"]["id"]
+        # Threads of init_cachet must not create the same group twice
+        with self._creation_lock(("group", name)):
+            # Check if component's group already exists
+            if self._group_index is not None:
+                components_gr_id = self._group_index.get(name, {"id": 0})
+            else:
+                components_gr_id = self.get_components_gr(name)
+            if components_gr_id["id"] == 0:
+                url = "component-groups"
+                params = {"name": name, "collapsed": 2}
+                logging.debug("Creating Component Group %s...", params["name"])
+                data = self._http_post(url, params)
+                self._cache.pop((url, name), None)
+                if data is not None and "data" in data:
+                    logging.info(
+                        "Component Group %s was created (%s)",
+                        params["name"],
+                        data["data"]["id"],
                     )
-                )
+                    if self._group_index is not None:
+                        self._group_index[name] = data["data"]
 
-            return data["data"]
+                return data["data"]
 
-        return components_gr_id
+            return components_gr_id
 
     def get_unresolved_incident(self, component_id):
         """
@@ -545,26 +912,26 @@ class Cachet:
         @param component_id: string
         @return: dict of data
         """
-        url = "incidents"
-        page = 1  # Start with the first page
-
-        while True:
-            # Fetch the current page data
-            response = self._http_get(url, params={"page": page})
-
-            data = response.get("data", [])
-            meta = response.get("meta", {})
-            for incident in data:
-                if (
-                    incident.get("attributes").get("component_id") == int(component_id)
-                    and "__Resolved__" not in incident["attributes"]["message"]
-                ):
-                    return incident
-
-            if not data or meta.get("to") is None:
-                break
+        return self._cached_get(
+            "incidents",
+            str(component_id),
+            lambda: self._find_unresolved_incident(component_id),
+        )
 
-            page += 1
+    def _find_unresolved_incident(self, component_id):
+        """
+        Search incidents pages for last unresolved incident of component_id
+        @param component_id: string
+        @return: dict of data
+        """
+        url = "incidents"
+        # Newest incidents first, unresolved one is most likely on page 1
+        for incident in self._paginate(url, {"sort": "-id"}):
+            if (
+                incident.get("attributes").get("component_id") == int(component_id)
+                and "__Resolved__" not in incident["attributes"]["message"]
+            ):
+                return incident
 
         return {
             "id": "0",
@@ -588,12 +955,12 @@ class Cachet:
         params.update(kwargs)
 
         response = self._http_post(url, params)
+        self._invalidate(params["component_id"])
         logging.info(
-            "Incident {name} (id={incident_id}) was created for component id {component_id}.".format(
-                name=params["name"],
-                incident_id=response["data"].get("id"),
-                component_id=params["component_id"],
-            )
+            "Incident %s (id=%s) was created for component id %s.",
+            params["name"],
+            response["data"].get("id"),
+            params["component_id"],
         )
 
         if "component_status" in params and params["component_id"] is not None:
@@ -614,10 +981,12 @@ class Cachet:
         url = "incidents/" + str(id)
         params = kwargs
         response = self._http_put(url, params)
+        if params.get("component_id") is not None:
+            self._invalidate(params["component_id"])
         logging.info(
-            "Incident ID {id} was updated. Status - {status}.".format(
-                id=id, status=response["data"]["attributes"]["status"]["human"]
-            )
+            "Incident ID %s was updated. Status - %s.",
+            id,
+            response["data"]["attributes"]["status"]["human"],
         )
 
         if "component_status" in params and params["component_id"] is not None:
@@ -627,8 +996,66 @@ class Cachet:
 
         return response
 
+    def queue_component_update(self, id, **kwargs):
+        """
+        Postpone component update till flush_batched()
+        Several updates of the same component are merged
+        @param id: string
+        @param kwargs: the same as for upd_components
+        @return: None
+        """
+        with self._pending_lock:
+            self._pending_components.setdefault(str(id), {}).update(kwargs)
+
+    def queue_incident_update(self, id, **kwargs):
+        """
+        Postpone incident update till flush_batched()
+        Several updates of the same incident are merged
+        @param id: string
+        @param kwargs: the same as for upd_incident
+        @return: None
+        """
+        with self._pending_lock:
+            self._pending_incidents.setdefault(str(id), {}).update(kwargs)
+
+    def flush_batched(self, executor=None):
+        """
+        Send all postponed component and incident updates
+        Cachet API does not support bulk update, so every update is a separate
+        request over keep-alive session
+        @param executor: concurrent.futures.Executor to send updates in parallel
+        @return: None
+        """
+        with self._pending_lock:
+            components, self._pending_components = self._pending_components, {}
+            incidents, self._pending_incidents = self._pending_incidents, {}
+
+        jobs = []
+        for id, params in incidents.items():
+            jobs.append(functools.partial(self.upd_incident, id, **params))
+            # upd_incident updates component status by itself
+            if "component_status" in params and params.get("component_id") is not None:
+                components.pop(str(params["component_id"]), None)
+        for id, params in components.items():
+            jobs.append(functools.partial(self.upd_components, id, **params))
+
+        if executor is None:
+            for job in jobs:
+                job()
+            self._told.clear()
+            return
+        futures = [executor.submit(job) for job in jobs]
+        for future in concurrent.futures.as_completed(futures):
+            if future.exception():
+                logging.error(
+                    "Failed to update Cachet: %s",
+                    future.exception(),
+                    exc_info=future.exception(),
+                )
+        self._told.clear()
+
 
-def triggers_watcher(service_map):
+def triggers_watcher(service_map, timeout=None):
     """
     Check zabbix triggers and update Cachet components
     Zabbix Priority:
@@ -644,250 +1071,319 @@ def triggers_watcher(service_map):
         2 - Identified - You've found the issue and you're working on a fix.
         3 - Watching - You've since deployed a fix and you're currently watching the situation.
         4 - Fixed
-    @param service_map: list of tuples
+    @param service_map: list of ServiceEntry
+    @param timeout: seconds to wait for Cachet updates
     @return: boolean
     """
-    for i in service_map:
-        inc_status = CachetIncidentStatus.INVESTIGATING.value
-        comp_status = CachetComponentStatus.OPERATIONAL.value
-        # inc_name = ''
-        inc_msg = ""
-
-        logging.debug("Object {}".format(i))
-
-        if "triggerid" in i:
-            trigger = zapi.get_trigger(i["triggerid"])
-            # Check if Zabbix return trigger
-            if "value" not in trigger:
-                logging.error("Cannot get value for trigger {}".format(i["triggerid"]))
-                continue
-            # Check if incident already registered
-            # Trigger non Active
-            if str(trigger["value"]) == "0":
-                component = cachet.get_component(i["component_id"])
-                component_status = (
-                    component.get("data").get("attributes").get("status").get("value")
-                )
+    triggerids = [i.triggerid for i in service_map if i.triggerid is not None]
+    triggers_by_id = zapi.get_triggers_bulk(triggerids)
+    # Events are needed only for triggers in problem state
+    problem_ids = [
+        triggerid
+        for triggerid, trigger in triggers_by_id.items()
+        if str(trigger.get("value")) == "1"
+    ]
+    events_by_id = zapi.get_events_bulk(problem_ids)
+
+    futures = [
+        pool.submit(process_service_map_entry, i, triggers_by_id, events_by_id)
+        for i in service_map
+    ]
+    done, not_done = concurrent.futures.wait(futures, timeout=timeout)
+    for future in done:
+        if future.exception():
+            logging.error(
+                "Failed to process service: %s",
+                future.exception(),
+                exc_info=future.exception(),
+            )
+    if not_done:
+        # Do not let late jobs pile up in pool and replay stale trigger state
+        for future in not_done:
+            future.cancel()
+        logging.warning(
+            "%s services were not processed within %s seconds", len(not_done), timeout
+        )
+    cachet.flush_batched(pool)
 
-                if str(component_status) == "1":
-                    continue
-
-                last_inc = cachet.get_unresolved_incident(i["component_id"])
-                if str(last_inc["id"]) != "0":
-                    if resolving_tmpl:
-                        inc_msg = (
-                            resolving_tmpl.format(
-                                time=datetime.datetime.now(tz=tz).strftime(
-                                    "%b %d, %H:%M"
-                                ),
-                            )
-                            + cachet.get_unresolved_incident(i["component_id"])[
-                                "attributes"
-                            ]["message"]
-                        )
-                    else:
-                        inc_msg = cachet.get_unresolved_incident(i["component_id"])[
-                            "attributes"
-                        ]["message"]
-                    cachet.upd_incident(
-                        last_inc["id"],
-                        status=4,
-                        component_id=i["component_id"],
-                        component_status=1,
-                        message=inc_msg,
-                    )
-                # Incident does not exist. Just change component status
-                else:
-                    cachet.upd_components(i["component_id"], status=1)
-                continue
-            if trigger["value"] == "1":
-                zbx_event = zapi.get_event(i["triggerid"])
-                inc_name = trigger["description"]
-                if not zbx_event:
-                    logging.warning(
-                        "Failed to get zabbix event for trigger {}".format(
-                            i["triggerid"]
+    return True
+
+
+def process_service_map_entry(i, triggers_by_id, events_by_id):
+    """
+    Sync state of one Zabbix trigger to its Cachet component and incident
+    @param i: ServiceEntry
+    @param triggers_by_id: dict {triggerid: trigger}
+    @param events_by_id: dict {triggerid: last problem event}
+    @return: None
+    """
+    inc_status = INCIDENT_INVESTIGATING
+    comp_status = COMPONENT_OPERATIONAL
+    # inc_name = ''
+    inc_msg = ""
+
+    logging.debug("Object %s", i)
+
+    if i.triggerid is not None:
+        trigger = triggers_by_id.get(i.triggerid, {})
+        # Check if Zabbix return trigger
+        if "value" not in trigger:
+            logging.error("Cannot get value for trigger %s", i.triggerid)
+            return
+        # Check if incident already registered
+        # Trigger non Active
+        if str(trigger["value"]) == "0":
+            component = cachet.get_component(i.component_id)
+            component_status = (
+                component.get("data").get("attributes").get("status").get("value")
+            )
+
+            if str(component_status) == str(COMPONENT_OPERATIONAL):
+                return
+
+            last_inc = cachet.get_unresolved_incident(i.component_id)
+            if str(last_inc["id"]) != "0":
+                last_inc_msg = last_inc["attributes"]["message"]
+                if resolving_tmpl:
+                    inc_msg = (
+                        resolving_tmpl.format(
+                            time=datetime.datetime.now(tz=tz).strftime(TIME_FORMAT),
                         )
+                        + last_inc_msg
                     )
-                    # Mock zbx_event for further usage
-                    zbx_event = {
-                        "acknowledged": "0",
-                    }
-                if zbx_event.get("acknowledged", "0") == "1":
-                    inc_status = CachetIncidentStatus.IDENTIFIED.value
-                    for msg in zbx_event["acknowledges"]:
-                        # TODO: Add timezone?
-                        #       Move format to config file
-                        author = msg.get("name", "") + " " + msg.get("surname", "")
-                        ack_time = datetime.datetime.fromtimestamp(
-                            int(msg["clock"]), tz=tz
-                        ).strftime("%b %d, %H:%M")
-                        ack_msg = acknowledgement_tmpl.format(
-                            message=msg["message"], ack_time=ack_time, author=author
-                        )
-                        if ack_msg not in inc_msg:
-                            inc_msg = ack_msg + inc_msg
-                else:
-                    inc_status = CachetIncidentStatus.INVESTIGATING.value
-                if int(trigger["priority"]) >= ZabbixServiceStatus.HIGH.value:
-                    comp_status = CachetComponentStatus.MAJOR_OUTAGE.value
-                elif int(trigger["priority"]) == ZabbixServiceStatus.AVERAGE.value:
-                    comp_status = CachetIncidentStatus.PARTIAL_OUTAGE.value
                 else:
-                    comp_status = CachetIncidentStatus.PERFORMANCE_ISSUES.value
-
-                if not inc_msg and investigating_tmpl:
-                    if zbx_event:
-                        zbx_event_clock = int(zbx_event.get("clock"))
-                        zbx_event_time = datetime.datetime.fromtimestamp(
-                            zbx_event_clock, tz=tz
-                        ).strftime("%b %d, %H:%M")
-                    else:
-                        zbx_event_time = ""
-                    inc_msg = investigating_tmpl.format(
-                        group=i.get("group_name", ""),
-                        component=i.get("component_name", ""),
-                        time=zbx_event_time,
-                        trigger_description=trigger.get("comments", ""),
-                        trigger_name=trigger.get("description", ""),
+                    inc_msg = last_inc_msg
+                cachet.queue_incident_update(
+                    last_inc["id"],
+                    status=INCIDENT_FIXED,
+                    component_id=i.component_id,
+                    component_status=COMPONENT_OPERATIONAL,
+                    message=inc_msg,
+                )
+            # Incident does not exist. Just change component status
+            else:
+                cachet.queue_component_update(
+                    i.component_id, status=COMPONENT_OPERATIONAL
+                )
+            return
+        if trigger["value"] == "1":
+            zbx_event = events_by_id.get(i.triggerid, {})
+            inc_name = trigger["description"]
+            if not zbx_event:
+                logging.warning(
+                    "Failed to get zabbix event for trigger %s", i.triggerid
+                )
+                # Mock zbx_event for further usage
+                zbx_event = {
+                    "acknowledged": "0",
+                }
+            if zbx_event.get("acknowledged", "0") == "1":
+                inc_status = INCIDENT_IDENTIFIED
+                for msg in zbx_event["acknowledges"]:
+                    # TODO: Add timezone?
+                    #       Move format to config file
+                    author = msg.get("name", "") + " " + msg.get("surname", "")
+                    ack_time = format_clock(int(msg["clock"]))
+                    ack_msg = acknowledgement_tmpl.format(
+                        message=msg["message"], ack_time=ack_time, author=author
                     )
+                    if ack_msg not in inc_msg:
+                        inc_msg = ack_msg + inc_msg
+            else:
+                inc_status = INCIDENT_INVESTIGATING
+            comp_status = PRIORITY_TO_COMPONENT_STATUS[int(trigger["priority"])]
 
-                if not inc_msg and trigger.get("comments"):
-                    inc_msg = trigger.get("comments")
-                elif not inc_msg:
-                    inc_msg = trigger.get("description")
+            if not inc_msg and investigating_tmpl:
+                if zbx_event:
+                    zbx_event_clock = int(zbx_event.get("clock"))
+                    zbx_event_time = format_clock(zbx_event_clock)
+                else:
+                    zbx_event_time = ""
+                inc_msg = investigating_tmpl.format(
+                    group=i.group_name,
+                    component=i.component_name,
+                    time=zbx_event_time,
+                    trigger_description=trigger.get("comments", ""),
+                    trigger_name=trigger.get("description", ""),
+                )
 
-                if "group_name" in i:
-                    inc_name = i.get("group_name") + " | " + inc_name
+            if not inc_msg and trigger.get("comments"):
+                inc_msg = trigger.get("comments")
+            elif not inc_msg:
+                inc_msg = trigger.get("description")
+
+            if i.group_name:
+                inc_name = i.group_name + " | " + inc_name
+
+            last_inc = cachet.get_unresolved_incident(i.component_id)
+            # Incident not registered
+            if last_inc["attributes"]["status"]["value"] == -1:
+                cachet.new_incidents(
+                    name=inc_name,
+                    message=inc_msg,
+                    status=inc_status,
+                    component_id=i.component_id,
+                    component_status=comp_status,
+                )
 
-                last_inc = cachet.get_unresolved_incident(i["component_id"])
-                # Incident not registered
-                if last_inc["attributes"]["status"]["value"] == -1:
-                    cachet.new_incidents(
-                        name=inc_name,
+            # Incident already registered
+            elif last_inc["attributes"]["status"]["value"] not in (-1, INCIDENT_FIXED):
+                # Update incident only if its message or status have changed
+                if (
+                    last_inc["attributes"]["message"].strip() != inc_msg.strip()
+                    or last_inc["attributes"]["status"]["value"] != inc_status
+                ):
+                    cachet.queue_incident_update(
+                        last_inc["id"],
                         message=inc_msg,
                         status=inc_status,
-                        component_id=i["component_id"],
+                        component_id=i.component_id,
                         component_status=comp_status,
                     )
 
-                # Incident already registered
-                elif last_inc["attributes"]["status"]["value"] not in (-1, 4):
-                    # Only incident message can change. So check if this have happened
-                    if last_inc["attributes"]["message"].strip() != inc_msg.strip():
-                        cachet.upd_incident(
-                            last_inc["id"],
-                            message=inc_msg,
-                            status=inc_status,
-                            component_status=comp_status,
-                        )
-
-        else:
-            # TODO: ServiceID
-            # inc_msg = 'TODO: ServiceID'
-            continue
-
-    return True
+    else:
+        # TODO: ServiceID
+        # inc_msg = 'TODO: ServiceID'
+        return
 
 
-def triggers_watcher_worker(service_map, interval, event):
+def triggers_watcher_worker(service_maps, interval):
     """
     Worker for triggers_watcher. Run it continuously with specific interval
-    @param service_map: list of tuples
+    @param service_maps: queue.Queue of lists of ServiceEntry. None stops the worker
     @param interval: interval in seconds
-    @param event: treading.Event object
     @return:
     """
     logging.info("Start trigger watcher....")
-    while not event.is_set():
+    service_map = service_maps.get()
+    failed = False
+    next_tick = time.monotonic()
+    while service_map is not None:
+        # Wait till next tick, but take a new mapping immediately
+        try:
+            service_map = service_maps.get(timeout=max(0, next_tick - time.monotonic()))
+            next_tick = time.monotonic()
+            continue
+        except queue.Empty:
+            pass
         logging.debug("check Zabbix triggers")
         # Do not run if Zabbix is not available
-        if zapi.get_version():
+        # Successful check of previous tick is fresh enough
+        if zapi.is_available(health_ttl=interval * 2, force=failed):
             try:
-                triggers_watcher(service_map)
+                triggers_watcher(service_map, interval)
+                failed = False
             except Exception as e:
+                failed = True
                 logging.error(
                     "triggers_watcher() raised an Exception. Something gone wrong"
                 )
                 logging.error(e, exc_info=True)
         else:
             logging.error("Zabbix is not available. Skip checking...")
-        time.sleep(interval)
+        next_tick += interval
+        now = time.monotonic()
+        if now > next_tick + interval:
+            missed = int((now - next_tick) // interval)
+            logging.warning("triggers_watcher is late, skip %s missed check(s)", missed)
+            next_tick += missed * interval
     logging.info("end trigger watcher")
 
 
-def init_cachet(services):
+def init_cachet(services, triggers_by_id=None):
     """
     Init Cachet by syncing Zabbix service to it
     Also creates mapping between Cachet components and Zabbix IT services
     @param services: list
-    @return: list of tuples
+    @param triggers_by_id: dict {triggerid: trigger}, fetched if not passed
+    @return: list of ServiceEntry
     """
 
-    data = []
+    # Get all existing components and groups by a few requests
+    cachet.load_index()
+    if triggers_by_id is None:
+        # Get all triggers used by services by one request
+        triggers_by_id = zapi.get_triggers_bulk(collect_triggerids(services))
+    # Services are independent, so sync them in parallel
+    futures = []
     for zbx_service in services:
         if zbx_service.get("children"):
-            data.extend(process_zbx_service_with_children(zbx_service))
+            process = process_zbx_service_with_children
         else:
-            data.extend(process_zbx_service_without_children(zbx_service))
+            process = process_zbx_service_without_children
+        futures.append(pool.submit(process, zbx_service, triggers_by_id))
+
+    data = []
+    # Keep order of services to get the same mapping for the same services
+    for future in futures:
+        data.extend(future.result())
 
     return data
 
 
-def process_zbx_service_with_children(zbx_service):
+def collect_triggerids(services):
+    """
+    Collect ids of all triggers referenced by tree of Zabbix IT services
+    @param services: list
+    @return: list of strings
+    """
+    triggerids = set()
+    for zbx_service in services:
+        if zbx_service.get("triggerid"):
+            triggerids.add(zbx_service["triggerid"])
+        for dependency in zbx_service.get("children", []):
+            if dependency.get("problem_tags"):
+                triggerids.update(problem_tags_triggerids(dependency))
+            elif dependency.get("triggerid"):
+                triggerids.add(dependency["triggerid"])
+    return list(triggerids)
+
+
+def process_zbx_service_with_children(zbx_service, triggers_by_id):
     """
     Process Zabbix service with children and create Cachet components for each dependency.
     @param zbx_service: dict
-    @return: list of tuples
+    @param triggers_by_id: dict {triggerid: trigger}
+    @return: list of ServiceEntry
     """
     data = []
     group = cachet.new_components_gr(zbx_service["name"])
+    logging.debug("group %s", group)
+    group_id = group["id"]
+    group_name = group["attributes"]["name"]
 
     for dependency in zbx_service["children"]:
         logging.debug("dependency: %s", dependency)
-        dependency["status"] = map_zabbix_status_to_cachet_status(
-            dependency.get("status")
-        )
-        zxb2cachet_i = {}
-        if dependency.get("problem_tags"):
-            zxb2cachet_i = process_dependency_with_problem_tags(dependency, group)
-        elif dependency.get("triggerid"):
-            zxb2cachet_i = process_dependency_with_triggerid(dependency, group)
-        else:
-            zxb2cachet_i = process_dependency_without_trigger(dependency, group)
-
-        logging.debug("group {}".format(group))
-        zxb2cachet_i.update(
-            {
-                "group_id": group["id"],
-                "group_name": group.get("attributes").get("name"),
-            }
-        )
+        zxb2cachet_i = process_dependency(dependency, group_id, triggers_by_id)
+        if zxb2cachet_i is None:
+            continue
+        zxb2cachet_i.group_id = group_id
+        zxb2cachet_i.group_name = group_name
         data.append(zxb2cachet_i)
 
     return data
 
 
-def process_zbx_service_without_children(zbx_service):
+def process_zbx_service_without_children(zbx_service, triggers_by_id):
     """
     Process Zabbix service without children and create Cachet components if a trigger exists.
     @param zbx_service: dict
-    @return: list of tuples
+    @param triggers_by_id: dict {triggerid: trigger}
+    @return: list of ServiceEntry
     """
     data = []
     if "triggerid" in zbx_service:
         if int(zbx_service["triggerid"]) == 0:
             logging.error(
-                "Zabbix Service with service id = {} does not have trigger or child service".format(
-                    zbx_service["serviceid"]
-                )
+                "Zabbix Service with service id = %s does not have trigger or child service",
+                zbx_service["serviceid"],
             )
             return data
 
-        trigger = zapi.get_trigger(zbx_service["triggerid"])
+        trigger = triggers_by_id.get(zbx_service["triggerid"])
         if not trigger:
             logging.error(
-                "Failed to get trigger {} from Zabbix".format(zbx_service["triggerid"])
+                "Failed to get trigger %s from Zabbix", zbx_service["triggerid"]
             )
             return data
 
@@ -896,103 +1392,82 @@ def process_zbx_service_without_children(zbx_service):
             link=trigger["url"],
             description=trigger["description"],
         )
-        zxb2cachet_i = {
-            "triggerid": zbx_service["triggerid"],
-            "component_id": component["id"],
-            "component_name": component["name"],
-        }
+        zxb2cachet_i = ServiceEntry(
+            triggerid=zbx_service["triggerid"],
+            component_id=component["id"],
+            component_name=component["attributes"]["name"],
+        )
         data.append(zxb2cachet_i)
     else:
         logging.error(
-            "Service {} does not have associated triggerid, adjust Zabbix -> SLA Configuration".format(
-                zbx_service["name"]
-            )
+            "Service %s does not have associated triggerid, adjust Zabbix -> SLA Configuration",
+            zbx_service["name"],
         )
     return data
 
 
-def process_dependency_with_problem_tags(dependency, group):
+def process_dependency(dependency, group_id, triggers_by_id):
     """
-    Process a dependency with problem tags and create Cachet components.
+    Process a dependency of Zabbix service and create Cachet component.
+    Component is bound to the first known trigger from problem tags or to triggerid.
+    Dependency without trigger is watched by its service status.
     @param dependency: dict
-    @param group: dict
-    @return: dict
+    @param group_id: id of Cachet component group
+    @param triggers_by_id: dict {triggerid: trigger}
+    @return: ServiceEntry or None
     """
-    for t in dependency.get("problem_tags"):
-        if t.get("value"):
-            trigger_id = str(t.get("value")).split(":")
-            trigger = zapi.get_trigger(trigger_id[0])
-            if not trigger:
-                logging.error(
-                    "Failed to get trigger {} from Zabbix".format(
-                        dependency["triggerid"]
-                    )
-                )
-                continue
-
-            component = cachet.new_components(
-                dependency["name"],
-                component_group_id=group["id"],
-                link=trigger["url"],
-                status=dependency["status"],
-                description=trigger["description"],
-            )
-            logging.debug("Created component {}".format(component))
-
-            return {
-                "triggerid": trigger_id,
-                "component_id": component["id"],
-                "component_name": component.get("attributes").get("name"),
-            }
-    return {}
-
+    kwargs = {
+        "component_group_id": group_id,
+        "status": map_zabbix_status_to_cachet_status(dependency.get("status")),
+    }
+    if dependency.get("problem_tags"):
+        triggerids = problem_tags_triggerids(dependency)
+    elif dependency.get("triggerid"):
+        triggerids = (dependency["triggerid"],)
+    else:
+        triggerids = None
 
-def process_dependency_with_triggerid(dependency, group):
-    """
-    Process a dependency with triggerid and create Cachet components.
-    @param dependency: dict
-    @param group: dict
-    @return: dict
-    """
-    trigger = zapi.get_trigger(dependency["triggerid"])
-    if not trigger:
-        logging.error(
-            "Failed to get trigger {} from Zabbix".format(dependency["triggerid"])
+    trigger_id = None
+    if triggerids is not None:
+        for trigger_id in triggerids:
+            trigger = triggers_by_id.get(trigger_id)
+            if trigger:
+                break
+            logging.error("Failed to get trigger %s from Zabbix", trigger_id)
+        else:
+            return None
+        kwargs["link"] = trigger["url"]
+        kwargs["description"] = trigger["description"]
+
+    component = cachet.new_components(dependency["name"], **kwargs)
+    logging.debug("Created component %s", component)
+    if trigger_id is None:
+        return ServiceEntry(
+            serviceid=dependency["serviceid"],
+            component_id=component["id"],
+            component_name=component["attributes"]["name"],
         )
-        return {}
-
-    component = cachet.new_components(
-        dependency["name"],
-        component_group_id=group["id"],
-        link=trigger["url"],
-        status=dependency["status"],
-        description=trigger["description"],
+    return ServiceEntry(
+        triggerid=trigger_id,
+        component_id=component["id"],
+        component_name=component["attributes"]["name"],
     )
-    logging.debug("Created component {}".format(component))
-    return {
-        "triggerid": dependency["triggerid"],
-        "component_id": component["id"],
-        "component_name": component.get("attributes").get("name"),
-    }
 
 
-def process_dependency_without_trigger(dependency, group):
+def problem_tags_triggerids(dependency):
     """
-    Process a dependency without trigger and create Cachet components.
+    Get unique trigger ids from problem tags of Zabbix service
+    keeping order of tags
     @param dependency: dict
-    @param group: dict
-    @return: dict
+    @return: list of strings
     """
-    component = cachet.new_components(
-        dependency["name"],
-        component_group_id=group["id"],
-        status=dependency["status"],
+    return list(
+        dict.fromkeys(
+            t["value"].partition(":")[0]
+            for t in dependency.get("problem_tags", [])
+            if t.get("value")
+        )
     )
-    return {
-        "serviceid": dependency["serviceid"],
-        "component_id": component["id"],
-        "component_name": component["name"],
-    }
 
 
 def read_config(config_f):
@@ -1002,9 +1477,11 @@ def read_config(config_f):
     @return: dict of data
     """
     try:
-        return yaml.safe_load(open(config_f, "r"))
+        with open(config_f, "r") as f:
+            # libyaml based loader is much faster, if PyYAML was built with it
+            return yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
     except (yaml.error.MarkedYAMLError, IOError) as e:
-        logging.error("Failed to parse config file {}: {}".format(config_f, e))
+        logging.error("Failed to parse config file %s: %s", config_f, e)
     return None
 
 
@@ -1040,36 +1517,90 @@ if __name__ == "__main__":
     # Set Logging
     log_level = logging.getLevelName(SETTINGS["log_level"])
     log_level_requests = logging.getLevelName(SETTINGS["log_level_requests"])
+    # Threads and processes are not in the format. Skip collecting them
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    if log_level == logging.DEBUG:
+        log_format = "%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s"
+    else:
+        log_format = "%(asctime)s,%(msecs)d %(levelname)-8s %(message)s"
+        # No stack walk for caller file and line outside of debug
+        logging._srcfile = None
     logging.basicConfig(
-        format="%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s",
+        format=log_format,
         datefmt="%Y-%m-%d:%H:%M:%S",
         level=log_level,
     )
     logging.getLogger("requests").setLevel(log_level_requests)
-    logging.info(
-        "Zabbix Cachet v.{} started (config: {})".format(__version__, CONFIG_F)
+    logging.info("Zabbix Cachet v.%s started (config: %s)", __version__, CONFIG_F)
+    service_maps = queue.Queue()
+    pool = None
+    inc_update_t = threading.Thread(
+        name="Trigger Watcher",
+        target=triggers_watcher_worker,
+        args=(service_maps, SETTINGS["update_inc_interval"]),
+        daemon=True,
     )
-    inc_update_t = threading.Thread()
-    event = threading.Event()
     try:
         if ZABBIX["https-verify"] is False:
             urllib3.disable_warnings()
 
         zapi = Zabbix(
-            ZABBIX["server"], ZABBIX["user"], ZABBIX["pass"], ZABBIX["https-verify"]
+            ZABBIX["server"],
+            ZABBIX["user"],
+            ZABBIX["pass"],
+            ZABBIX["https-verify"],
+            max_workers=SETTINGS.get("concurrency", 8),
         )
-        cachet = Cachet(CACHET["server"], CACHET["token"], CACHET["https-verify"])
-        logging.info(
-            "Zabbix ver: {}. Cachet ver: {}".format(zapi.version, cachet.version)
+        cachet = Cachet(
+            CACHET["server"],
+            CACHET["token"],
+            CACHET["https-verify"],
+            cache_ttl=SETTINGS["update_inc_interval"] / 2,
+            max_workers=SETTINGS.get("concurrency", 8),
+            max_writes=SETTINGS.get("cachet_max_writes", 4),
+        )
+        pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=SETTINGS.get("concurrency", 8),
+            thread_name_prefix="Cachet Worker",
         )
+        logging.info("Zabbix ver: %s. Cachet ver: %s", zapi.version, cachet.version)
         zbxtr2cachet = ""
+        # One long-lived watcher. It waits for the first mapping
+        inc_update_t.start()
+        # Sync less often while Zabbix services stay the same
+        comp_interval = SETTINGS["update_comp_interval"]
+        comp_interval_max = max(
+            SETTINGS.get("update_comp_interval_max", comp_interval), comp_interval
+        )
+        unchanged_cycles = 0
+        last_itservices_fp = None
         while True:
             logging.debug("Getting list of Zabbix IT Services ...")
             itservices = zapi.get_itservices(SETTINGS["root_service"])
-            logging.debug("Zabbix IT Services: {}".format(itservices))
-            # Create Cachet components and components groups
-            logging.debug("Syncing Zabbix with Cachet...")
-            zbxtr2cachet_new = init_cachet(itservices)
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug("Zabbix IT Services: %s", itservices)
+            # Trigger url and description become component link and description
+            triggers_by_id = zapi.get_triggers_bulk(collect_triggerids(itservices))
+            itservices_fp = fingerprint(
+                [
+                    itservices,
+                    {
+                        k: (t.get("url"), t.get("description"))
+                        for k, t in triggers_by_id.items()
+                    },
+                ]
+            )
+            if zbxtr2cachet and itservices_fp == last_itservices_fp:
+                logging.debug("Zabbix IT Services did not change. Skip syncing")
+                zbxtr2cachet_new = zbxtr2cachet
+            else:
+                # Create Cachet components and components groups
+                logging.debug("Syncing Zabbix with Cachet...")
+                zbxtr2cachet_new = init_cachet(itservices, triggers_by_id)
+                if zbxtr2cachet_new:
+                    last_itservices_fp = itservices_fp
             if not zbxtr2cachet_new:
                 logging.error(
                     "Sorry, can not create Zabbix <> Cachet mapping for you. Please check above errors"
@@ -1083,35 +1614,27 @@ if __name__ == "__main__":
                 logging.info(
                     "Successfully synced Cachet components with Zabbix Services"
                 )
-            # Restart triggers_watcher_worker
-            if zbxtr2cachet != zbxtr2cachet_new:
+            # Hand new mapping to triggers_watcher_worker
+            if zbxtr2cachet == zbxtr2cachet_new:
+                unchanged_cycles += 1
+                if unchanged_cycles >= UNCHANGED_CYCLES_BEFORE_BACKOFF:
+                    comp_interval = min(comp_interval * 2, comp_interval_max)
+            else:
+                unchanged_cycles = 0
+                comp_interval = SETTINGS["update_comp_interval"]
                 zbxtr2cachet = zbxtr2cachet_new
-                logging.info("Restart triggers_watcher worker")
-                logging.debug("List of watching triggers {}".format(str(zbxtr2cachet)))
-                event.set()
-                # Wait until tread die
-                while inc_update_t.is_alive():
-                    time.sleep(1)
-                event.clear()
-                inc_update_t = threading.Thread(
-                    name="Trigger Watcher",
-                    target=triggers_watcher_worker,
-                    args=(zbxtr2cachet, SETTINGS["update_inc_interval"], event),
-                )
-                inc_update_t.daemon = True
-                inc_update_t.start()
-            time.sleep(SETTINGS["update_comp_interval"])
+                logging.info("Update triggers_watcher worker")
+                logging.debug("List of watching triggers %s", zbxtr2cachet)
+                service_maps.put(zbxtr2cachet)
+            logging.debug("Next sync in %s seconds", comp_interval)
+            time.sleep(comp_interval)
 
     except KeyboardInterrupt:
-        event.set()
+        service_maps.put(None)
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
         logging.info("Shutdown requested. See you.")
     except Exception as e:
-        logging.error(e)
-        logging.error(
-            "@@@@ Thread Exception: {}, {}, {}".format(
-                e, e.with_traceback, traceback.print_exc()
-            )
-        )
-
+        logging.exception("Thread exception: %s", e)
         exit_status = 1
     sys.exit(exit_status)